@@ -1,31 +1,120 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+from contextlib import asynccontextmanager
+import codecs
+import concurrent.futures
+import hashlib
 import os
 import asyncio
 from datetime import datetime
+
 import uuid
-import json
 from pathlib import Path
 
+import aiofiles
+import orjson
+
 # Import your crew components
 from crew import InvestmentCrew, get_chromarag
+from jobstore import get_job_store
 
-app = FastAPI(title="AlphaAgent API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Crew kickoffs run in worker processes so the event loop stays free.
+    # The pool must hold as many kickoffs as admission control admits,
+    # otherwise admitted jobs just queue inside the executor
+    app.state.pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=int(os.environ.get("ANALYSIS_WORKERS", _max_concurrent_analyses))
+    )
+    # Periodically evict expired jobs from the in-process store (no-op
+    # for the Redis backend, which relies on key TTLs)
+    gc_task = asyncio.create_task(job_store.gc_loop())
+    _uploaded_hashes.update(await asyncio.to_thread(_scan_uploaded_hashes))
+    yield
+    gc_task.cancel()
+    app.state.pool.shutdown(wait=False, cancel_futures=True)
+
+# orjson serializes the status/recent payloads several times faster than
+# the stdlib encoder and emits bytes directly
+app = FastAPI(
+    title="AlphaAgent API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
-# Configure CORS
+# Configure CORS. Origins come from the environment in production;
+# allow_credentials=True requires an explicit origin list ("*" makes
+# browsers drop credentials), and max_age lets browsers cache preflight
+# responses for a day instead of re-sending OPTIONS per request
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with your frontend URL
+    allow_origins=os.environ.get("CORS_ORIGINS", "http://localhost:8000,http://localhost:3000").split(","),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,
 )
 
-# Store analysis jobs
-analysis_jobs: Dict[str, Dict[str, Any]] = {}
+# Compress responses above half a KB; long SSE streams of JSON frames
+# compress several-fold
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
+# Store analysis jobs (in-process by default, Redis when REDIS_URL is set)
+job_store = get_job_store()
+
+# Upload limits
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024  # 50 MB
+UPLOAD_CHUNK_BYTES = 1 << 20  # 1 MB
+
+# Content digests of files already in the upload directory; uploads are
+# named by their SHA-256 so duplicates can be skipped entirely
+_uploaded_hashes: set = set()
+
+def _scan_uploaded_hashes() -> set:
+    """Collect the digests of already-uploaded (hash-named) files"""
+    upload_dir = Path("assets/rag_assets")
+    if not upload_dir.exists():
+        return set()
+    return {f.stem for f in upload_dir.iterdir() if f.is_file()}
+
+# Constant SSE frames, encoded once at import time
+_NOT_FOUND_FRAME = b'data: {"error": "Job not found"}\n\n'
+_PING_FRAME = b": ping\n\n"
+
+# How long the SSE stream waits after an update before emitting, so a
+# burst of state changes becomes one frame with the latest state
+SSE_BATCH_WINDOW_SECONDS = 0.05
+
+# Admission control for analysis jobs: an explicit counter guarded by a
+# Condition (rather than a Semaphore) so the limit can be retuned at
+# runtime and waiters re-check the predicate
+_active_analyses = 0
+_max_concurrent_analyses = int(os.environ.get("MAX_CONCURRENT_ANALYSES", "4"))
+_analysis_cond = asyncio.Condition()
+
+# Debounce state for ChromaDB reinitialization after PDF uploads
+REINIT_DEBOUNCE_SECONDS = 2
+_reinit_pending = asyncio.Event()
+_reinit_lock = asyncio.Lock()
+
+async def _debounced_reinit():
+    """Coalesce bursts of PDF uploads into a single ChromaDB rebuild"""
+    _reinit_pending.set()
+    if _reinit_lock.locked():
+        # Another task is already draining the flag; it will pick this
+        # upload up on its next pass
+        return
+    async with _reinit_lock:
+        while _reinit_pending.is_set():
+            # Let the burst settle, then rebuild once for all of it
+            await asyncio.sleep(REINIT_DEBOUNCE_SECONDS)
+            _reinit_pending.clear()
+            await asyncio.to_thread(get_chromarag, force_reinit=True)
 
 class StockAnalysisRequest(BaseModel):
     stock_ticker: str
@@ -39,12 +128,15 @@ class AnalysisStatus(BaseModel):
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
 
+class ConcurrencyConfig(BaseModel):
+    max_concurrent_analyses: int
+
 @app.get("/")
 async def root():
     return {"message": "AlphaAgent API is running", "version": "1.0.0"}
 
 @app.post("/api/upload-document")
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """Upload a financial document for analysis"""
     try:
         # Validate file type
@@ -56,36 +148,76 @@ async def upload_document(file: UploadFile = File(...)):
                 status_code=400,
                 detail=f"File type not allowed. Allowed types: {', '.join(allowed_extensions)}"
             )
-        
+
+        # Reject oversized uploads before reading anything
+        if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum size: {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"
+            )
+
         # Create directory if it doesn't exist
         upload_dir = Path("assets/rag_assets")
-        upload_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Save file with unique name
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{file.filename}"
-        file_path = upload_dir / filename
-        
-        content = await file.read()
-        
-        # Handle text files
-        if file_extension == '.txt':
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content.decode('utf-8'))
-        else:
-            with open(file_path, 'wb') as f:
-                f.write(content)
-        
-        # Reinitialize ChromaDB with new document (only if it's a PDF)
+        await asyncio.to_thread(upload_dir.mkdir, parents=True, exist_ok=True)
+
+        # Text files are validated as UTF-8 while streaming
+        decoder = codecs.getincrementaldecoder('utf-8')() if file_extension == '.txt' else None
+
+        # Stream to disk in chunks so a large filing never sits in RAM,
+        # hashing the content on the way through for deduplication
+        tmp_path = upload_dir / f".upload_{uuid.uuid4().hex}.tmp"
+        hasher = hashlib.sha256()
+        written = 0
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                    written += len(chunk)
+                    if written > MAX_UPLOAD_BYTES:
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"File too large. Maximum size: {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"
+                        )
+                    if decoder is not None:
+                        decoder.decode(chunk)
+                    hasher.update(chunk)
+                    await f.write(chunk)
+            if decoder is not None:
+                decoder.decode(b"", final=True)
+        except Exception:
+            # Don't leave a partial file behind
+            await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+            raise
+
+        # Same content as an earlier upload: drop the copy and skip the
+        # ChromaDB reindex entirely
+        digest = hasher.hexdigest()
+        filename = f"{digest}{file_extension}"
+        if digest in _uploaded_hashes:
+            await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+            return {
+                "success": True,
+                "filename": filename,
+                "dedup": True,
+                "message": "Document already uploaded"
+            }
+
+        await asyncio.to_thread(tmp_path.replace, upload_dir / filename)
+        _uploaded_hashes.add(digest)
+
+        # Reinitialize ChromaDB with new document (only if it's a PDF).
+        # The rebuild is heavy, so it runs debounced in the background
+        # instead of on the request path
         if file_extension == '.pdf':
-            get_chromarag(force_reinit=True)
+            background_tasks.add_task(_debounced_reinit)
         
         return {
             "success": True,
             "filename": filename,
             "message": "Document uploaded successfully"
         }
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -97,7 +229,7 @@ async def analyze_stock(request: StockAnalysisRequest, background_tasks: Backgro
         job_id = str(uuid.uuid4())
         
         # Initialize job status
-        analysis_jobs[job_id] = {
+        await job_store.create(job_id, {
             "status": "pending",
             "progress": 0,
             "message": "Analysis job created",
@@ -105,7 +237,7 @@ async def analyze_stock(request: StockAnalysisRequest, background_tasks: Backgro
             "created_at": datetime.now().isoformat(),
             "result": None,
             "error": None
-        }
+        })
         
         # Start analysis in background
         background_tasks.add_task(
@@ -124,23 +256,40 @@ async def analyze_stock(request: StockAnalysisRequest, background_tasks: Backgro
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _kickoff_worker(stock_ticker: str, inputs: Dict[str, Any]) -> str:
+    """Run a crew kickoff inside a worker process.
+
+    Each analysis builds its own InvestmentCrew bound to its ticker, so
+    concurrent jobs cannot interfere with each other.
+    """
+    investment_crew = InvestmentCrew(stock_ticker)
+    print(f"Stock ticker set to: {investment_crew.stock}")
+    return str(investment_crew.crew().kickoff(inputs=inputs))
+
 async def run_analysis(job_id: str, stock_ticker: str, include_uploaded_docs: bool):
     """Run the actual stock analysis"""
+    global _active_analyses
+
+    # Wait for an analysis slot so a burst of POSTs can't launch an
+    # unbounded number of concurrent kickoffs
+    async with _analysis_cond:
+        await _analysis_cond.wait_for(lambda: _active_analyses < _max_concurrent_analyses)
+        _active_analyses += 1
+
     try:
         print(f"Starting analysis for {stock_ticker} (Job ID: {job_id})")
         
         # Update status
-        analysis_jobs[job_id]["status"] = "processing"
-        analysis_jobs[job_id]["progress"] = 10
-        analysis_jobs[job_id]["message"] = "Initializing analysis agents..."
-        
+        await job_store.update(job_id, status="processing", progress=10, message="Initializing analysis agents...")
+
         # Initialize ChromaDB if needed and documents are uploaded
         if include_uploaded_docs:
-            analysis_jobs[job_id]["progress"] = 20
-            analysis_jobs[job_id]["message"] = "Loading uploaded documents..."
-            chromarag = get_chromarag()
+            await job_store.update(job_id, progress=20, message="Loading uploaded documents...")
+            # A cold process may build the whole Chroma corpus here, so
+            # keep it off the event loop
+            chromarag = await asyncio.to_thread(get_chromarag)
             if chromarag is None:
-                analysis_jobs[job_id]["message"] = "No documents found, proceeding without document analysis..."
+                await job_store.update(job_id, message="No documents found, proceeding without document analysis...")
                 print("No documents found for ChromaDB")
         
         # Prepare inputs with the actual stock ticker
@@ -151,41 +300,36 @@ async def run_analysis(job_id: str, stock_ticker: str, include_uploaded_docs: bo
         print(f"Inputs prepared: {inputs}")
         
         # Update progress
-        analysis_jobs[job_id]["progress"] = 30
-        analysis_jobs[job_id]["message"] = "Starting fundamental analysis..."
-        print("Creating crew...")
-        
-        # Create an instance of InvestmentCrew and set the stock BEFORE creating crew
-        investment_crew = InvestmentCrew()
-        investment_crew.stock = stock_ticker
-        InvestmentCrew.stock = stock_ticker  # Also set the class variable
-        print(f"Stock ticker set to: {investment_crew.stock} (class: {InvestmentCrew.stock})")
-        
-        # Run the crew analysis
-        crew = investment_crew.crew()
-        print("Crew created, starting kickoff...")
-        
-        analysis_jobs[job_id]["progress"] = 50
-        analysis_jobs[job_id]["message"] = "Performing valuation analysis..."
-        
-        result = crew.kickoff(inputs=inputs)
+        await job_store.update(job_id, progress=30, message="Starting fundamental analysis...")
+        print("Dispatching crew kickoff to worker process...")
+
+        await job_store.update(job_id, progress=50, message="Performing valuation analysis...")
+
+        # The kickoff is synchronous and LLM-bound; run it in the process
+        # pool so the event loop keeps serving SSE/upload/status requests
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            app.state.pool, _kickoff_worker, stock_ticker, inputs
+        )
         print(f"Analysis complete. Result: {result}")
-        
-        analysis_jobs[job_id]["progress"] = 80
-        analysis_jobs[job_id]["message"] = "Analyzing market sentiment..."
+
+        await job_store.update(job_id, progress=80, message="Analyzing market sentiment...")
         
         # Parse the result - just return the summary
         analysis_result = {
             "stock_ticker": stock_ticker,
             "timestamp": datetime.now().isoformat(),
-            "summary": str(result)  # Just the summary, nothing else
+            "summary": result  # Just the summary, nothing else
         }
         
         # Update job status
-        analysis_jobs[job_id]["status"] = "completed"
-        analysis_jobs[job_id]["progress"] = 100
-        analysis_jobs[job_id]["message"] = "Analysis completed successfully"
-        analysis_jobs[job_id]["result"] = analysis_result
+        await job_store.update(
+            job_id,
+            status="completed",
+            progress=100,
+            message="Analysis completed successfully",
+            result=analysis_result
+        )
         print(f"Analysis completed successfully for {stock_ticker}")
         
     except Exception as e:
@@ -194,17 +338,19 @@ async def run_analysis(job_id: str, stock_ticker: str, include_uploaded_docs: bo
         print(f"ERROR in analysis for {stock_ticker}:")
         print(detailed_error)
         
-        analysis_jobs[job_id]["status"] = "failed"
-        analysis_jobs[job_id]["error"] = str(e)
-        analysis_jobs[job_id]["message"] = f"Analysis failed: {str(e)}"
+        await job_store.update(job_id, status="failed", error=str(e), message=f"Analysis failed: {str(e)}")
+    finally:
+        async with _analysis_cond:
+            _active_analyses -= 1
+            _analysis_cond.notify(1)
 
 @app.get("/api/analysis-status/{job_id}")
 async def get_analysis_status(job_id: str):
     """Get the status of an analysis job"""
-    if job_id not in analysis_jobs:
+    job = await job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = analysis_jobs[job_id]
+
     return AnalysisStatus(
         job_id=job_id,
         status=job["status"],
@@ -218,56 +364,106 @@ async def get_analysis_status(job_id: str):
 async def stream_analysis_status(job_id: str):
     """Stream analysis status updates using Server-Sent Events"""
     async def generate():
-        while True:
-            if job_id not in analysis_jobs:
-                yield f"data: {json.dumps({'error': 'Job not found'})}\n\n"
-                break
-                
-            job = analysis_jobs[job_id]
+        if await job_store.get(job_id) is None:
+            yield _NOT_FOUND_FRAME
+            return
+
+        async with job_store.watch(job_id) as watch:
+            last_version = None
+            # One frame dict reused across updates; only the values change
             data = {
-                "status": job["status"],
-                "progress": job["progress"],
-                "message": job["message"],
-                "result": job.get("result"),
-                "error": job.get("error")
+                "status": None,
+                "progress": None,
+                "message": None,
+                "result": None,
+                "error": None
             }
-            
-            yield f"data: {json.dumps(data)}\n\n"
-            
-            if job["status"] in ["completed", "failed"]:
-                break
-                
-            await asyncio.sleep(1)
+            while True:
+                job = await job_store.get(job_id)
+                if job is None:
+                    yield _NOT_FOUND_FRAME
+                    break
+
+                if job["version"] != last_version:
+                    last_version = job["version"]
+                    data["status"] = job["status"]
+                    data["progress"] = job["progress"]
+                    data["message"] = job["message"]
+                    data["result"] = job.get("result")
+                    data["error"] = job.get("error")
+
+                    yield b"data: " + orjson.dumps(data) + b"\n\n"
+
+                    if job["status"] in ["completed", "failed"]:
+                        break
+
+                # Wait for the next update instead of polling; the timeout
+                # only drives a periodic keepalive comment
+                if await watch.wait(last_version, timeout=15):
+                    # Let the burst settle so back-to-back updates
+                    # collapse into a single frame
+                    await asyncio.sleep(SSE_BATCH_WINDOW_SECONDS)
+                else:
+                    yield _PING_FRAME
     
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Connection": "keep-alive"
+        }
+    )
 
 @app.get("/api/recent-analyses")
 async def get_recent_analyses():
     """Get list of recent analysis jobs"""
-    recent = []
-    for job_id, job in analysis_jobs.items():
-        recent.append({
-            "job_id": job_id,
-            "stock_ticker": job.get("stock_ticker"),
-            "status": job["status"],
-            "created_at": job.get("created_at"),
-            "message": job["message"]
-        })
-    
-    # Sort by created_at and return last 10
-    recent.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-    return recent[:10]
+    return await job_store.recent(limit=10)
+
+@app.get("/api/config/concurrency")
+async def get_concurrency():
+    """Get the analysis concurrency limit and current usage"""
+    return {
+        "max_concurrent_analyses": _max_concurrent_analyses,
+        "active_analyses": _active_analyses
+    }
+
+@app.put("/api/config/concurrency")
+async def set_concurrency(config: ConcurrencyConfig):
+    """Retune the analysis concurrency limit at runtime.
+
+    The process pool is sized to the limit in effect at startup, so
+    raising the limit past ANALYSIS_WORKERS queues kickoffs inside the
+    executor until a restart.
+    """
+    global _max_concurrent_analyses
+    if config.max_concurrent_analyses < 1:
+        raise HTTPException(status_code=400, detail="max_concurrent_analyses must be >= 1")
+
+    async with _analysis_cond:
+        _max_concurrent_analyses = config.max_concurrent_analyses
+        # Wake every waiter so they re-check against the new limit
+        _analysis_cond.notify_all()
+
+    return {"max_concurrent_analyses": _max_concurrent_analyses}
+
+def _sync_clear(upload_dir: Path):
+    """Delete every file under upload_dir (runs in a worker thread)"""
+    if upload_dir.exists():
+        for file in upload_dir.glob("*"):
+            if file.is_file():
+                file.unlink()
 
 @app.delete("/api/clear-documents")
 async def clear_documents():
     """Clear all uploaded documents"""
     try:
-        upload_dir = Path("assets/rag_assets")
-        if upload_dir.exists():
-            for file in upload_dir.glob("*"):
-                if file.is_file():
-                    file.unlink()
-        
+        # Batch the glob/unlink loop in one thread hop so a slow disk
+        # never stalls the event loop
+        await asyncio.to_thread(_sync_clear, Path("assets/rag_assets"))
+        _uploaded_hashes.clear()
+
         return {"success": True, "message": "All documents cleared"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -275,4 +471,18 @@ async def clear_documents():
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))  # Use PORT env variable if available
-    uvicorn.run(app, host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
+    if os.environ.get("DEV"):
+        # Single worker with auto-reload for local development
+        uvicorn.run("app:app", host="0.0.0.0", port=port, reload=True)
+    else:
+        # Multiple workers need shared job state, so stay single-worker
+        # unless the Redis store is configured or WEB_CONCURRENCY is set
+        default_workers = (os.cpu_count() or 1) if os.environ.get("REDIS_URL") else 1
+        uvicorn.run(
+            "app:app",
+            host="0.0.0.0",
+            port=port,
+            loop="uvloop",
+            http="httptools",
+            workers=int(os.environ.get("WEB_CONCURRENCY", default_workers)),
+        )
\ No newline at end of file
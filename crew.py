@@ -15,6 +15,7 @@ from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader
 
 from typing import Optional
 import logging
+import threading
 from pathlib import Path
 import glob
 from rag_setup import fetch_for_ticker
@@ -80,25 +81,36 @@ class SemanticChromaRAG:
 
 
 _chromarag: Optional[SemanticChromaRAG] = None
+_chromarag_lock = threading.Lock()
 
 def get_chromarag(force_reinit: bool = False):
-    """Get or create the ChromaRAG instance (lazy initialization)"""
+    """Get or create the ChromaRAG instance (lazy initialization).
+
+    The instance is cached per process so repeated analyses reuse the
+    same Chroma handle; force_reinit drops the cached instance and
+    rebuilds it from the current document set.
+    """
     global _chromarag
-    
+
     docs_path = Path("assets/rag_assets/")
     if not docs_path.exists():
         print("No documents directory found")
         return None
-    
+
     pdf_files = list(docs_path.glob("**/*.pdf"))
     if not pdf_files:
         print("No PDF documents found in assets/rag_assets/")
         return None
-    
+
     if _chromarag is None or force_reinit:
-        print("Initializing ChromaRAG...")
-        _chromarag = SemanticChromaRAG(docs_path="assets/rag_assets/")
-        print("ChromaRAG initialization complete")
+        # Builds are expensive and may be triggered from worker threads,
+        # so serialize them and re-check the cache under the lock
+        with _chromarag_lock:
+            if _chromarag is None or force_reinit:
+                print("Initializing ChromaRAG...")
+                _chromarag = None  # drop the stale handle before rebuilding
+                _chromarag = SemanticChromaRAG(docs_path="assets/rag_assets/")
+                print("ChromaRAG initialization complete")
     return _chromarag
 
 
@@ -124,243 +136,257 @@ def CustomRagTool(query: str) -> str:
     except Exception as e:
         return f"Error searching documents: {str(e)}"
 
-@tool
-def getNewsBodyTool(*args, **kwargs) -> list:
-    """
-    Get the news body for a company by reading all text files under
-    assets/rag_assets/{stock}/news/.
-    """
-    stock = InvestmentCrew.stock
-    print(f"[getNewsBodyTool] Using stock ticker: {stock}")
-
-    base_dir = os.path.join("assets", "rag_assets", str(stock), "news")    
-    final_news_content = []
-
-    if not os.path.isdir(base_dir):
-        print(f"[getNewsBodyTool] Directory not found: {base_dir}")
-    else:
-        patterns = ["*.txt", "*.md", "*.text"]
-        files = []
-        for pattern in patterns:
-            files.extend(sorted(glob.glob(os.path.join(base_dir, pattern))))
-
-        for fp in files:
-            try:
-                if not os.path.isfile(fp):
-                    continue
-                with open(fp, "r", encoding="utf-8", errors="replace") as f:
-                    content = f.read().strip()
-                    if content:
-                        final_news_content.append(content)
-            except Exception as e:
-                print(f"[getNewsBodyTool] Failed to read {fp}: {e}")
-
-    if not final_news_content:
-        print(f"[getNewsBodyTool] ⚠️ No news found for {stock}.")
-    else:
-        print(f"[getNewsBodyTool] ✅ Found {len(final_news_content)} news articles for {stock}.")
-
-    return final_news_content
-
-@tool
-def findnewsTool(*args, **kwargs) -> str:
-    """
-    Fetch news articles for a company and save them under
-    assets/rag_assets/{stock}/news/.
-    """
-    stock = InvestmentCrew.stock
-    print(f"[findnewsTool] Using stock ticker: {stock}")
-
-    try:
-        fetch_for_ticker(stock, limit=12)
-        return f"News articles fetched and saved for {stock}."
-    except Exception as e:
-        traceback_str = traceback.format_exc()
-        print(f"[findnewsTool] Error fetching news for {stock}: {e}\n{traceback_str}")
-        return f"Failed to fetch news for {stock}: {e}"
-
-@tool
-def getAnnualisedVolatilityTool(*args, **kwargs) -> str:
-    """
-    Get the annualised volatility for a company
-    Args:
-        stock (str): Stock ticker
-    """
-    # Access the stock from the class variable
-    stock = InvestmentCrew.stock
-    print(f"[getAnnualisedVolatilityTool] Using stock ticker: {stock}")
-    dat = yf.Ticker(f"{stock}")
-    df = dat.history(period="3mo")
-    log_returns = np.log(df["Close"] / df["Close"].shift(1))
-    volatility = log_returns.std() * (252**0.5)
-    return volatility
-
-
-@tool
-def getAnnualisedReturnTool(*args, **kwargs) -> float:
-    """
-    Get the annualised return for a company
-    Args:
-        stock (str): Stock ticker
-    """
-    # Access the stock from the class variable
-    stock = InvestmentCrew.stock
-    print(f"[getAnnualisedReturnTool] Using stock ticker: {stock}")
-    dat = yf.Ticker(f"{stock}")
-    df = dat.history(period="3mo")
-    cummulative_return = (
-        float(df["Close"].iloc[-1])
-        / float(df["Close"].iloc[0])
-    ) - 1
-    annualised_return = (1 + cummulative_return) ** (252 / len(df)) - 1
-    return annualised_return
-
-
-@tool
-def fundamental_analysis_tool(*args, **kwargs):
-    """Tool to analyze the BalanceSheet of a company and provide a summary"""
-    # Access the stock from the class variable
-    stock = InvestmentCrew.stock
-    print(f"[fundamental_analysis_tool] Using stock ticker: {stock}")
-    # Get the stock balance sheet
-    dat = yf.Ticker(f"{stock}")
-    balance_sheet_data = dat.balance_sheet
-
-    # Create messages
-    messages = [
-        SystemMessage(
-            content="You are a financial analyst. Provide correct answers only. If you don't know, say so."
-        ),
-        HumanMessage(
-            content=f"Here is a Pandas DataFrame:\n{balance_sheet_data}\n\nSummarize the financial results in INR. Don't ask for anything else."
-        ),
-    ]
-
-    # Get response
-    response = client(messages)
-
-    # Access content
-    summary = response.content
-    return summary
-
-@tool
-def getMovingAveragesTool(*args, **kwargs) -> dict:
-    """
-    Compute short-term and long-term moving averages for the company's stock.
-    Returns both SMA and EMA for 20 and 50 days.
-    """
-    stock = InvestmentCrew.stock
-    print(f"[getMovingAveragesTool] Using stock ticker: {stock}")
-    df = yf.Ticker(stock).history(period="6mo")
-    if df.empty:
-        return {"error": "No data available"}
-
-    df["SMA_20"] = df["Close"].rolling(window=20).mean()
-    df["SMA_50"] = df["Close"].rolling(window=50).mean()
-    df["EMA_20"] = df["Close"].ewm(span=20, adjust=False).mean()
-    df["EMA_50"] = df["Close"].ewm(span=50, adjust=False).mean()
-
-    latest = df.iloc[-1]
-    return {
-        "SMA_20": round(latest["SMA_20"], 2),
-        "SMA_50": round(latest["SMA_50"], 2),
-        "EMA_20": round(latest["EMA_20"], 2),
-        "EMA_50": round(latest["EMA_50"], 2),
-    }
-
-
-@tool
-def getRSITool(*args, **kwargs) -> float:
-    """
-    Calculate the 14-day Relative Strength Index (RSI).
-    Returns RSI as a float.
-    """
-    stock = InvestmentCrew.stock
-    print(f"[getRSITool] Using stock ticker: {stock}")
-    df = yf.Ticker(stock).history(period="6mo")
-    if df.empty:
-        return 0.0
-
-    delta = df["Close"].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    latest_rsi = round(rsi.iloc[-1], 2)
-    return latest_rsi
-
-
-@tool
-def getMACDTool(*args, **kwargs) -> dict:
-    """
-    Compute MACD (12, 26, 9) and return the latest MACD line, signal line, and histogram.
-    """
-    stock = InvestmentCrew.stock
-    print(f"[getMACDTool] Using stock ticker: {stock}")
-    df = yf.Ticker(stock).history(period="6mo")
-    if df.empty:
-        return {"error": "No data available"}
-
-    ema12 = df["Close"].ewm(span=12, adjust=False).mean()
-    ema26 = df["Close"].ewm(span=26, adjust=False).mean()
-    macd_line = ema12 - ema26
-    signal_line = macd_line.ewm(span=9, adjust=False).mean()
-    hist = macd_line - signal_line
-
-    return {
-        "MACD": round(macd_line.iloc[-1], 3),
-        "Signal": round(signal_line.iloc[-1], 3),
-        "Histogram": round(hist.iloc[-1], 3),
-    }
-
-
-@tool
-def getTechnicalSignalTool(*args, **kwargs) -> str:
-    """
-    Generate an overall technical trading signal (BUY / SELL / HOLD)
-    based on moving averages, RSI, and MACD.
-    """
-    stock = InvestmentCrew.stock
-    print(f"[getTechnicalSignalTool] Using stock ticker: {stock}")
-    df = yf.Ticker(stock).history(period="6mo")
-    if df.empty:
-        return "Insufficient data for signal generation."
-
-    # --- Moving Average Crossover ---
-    df["SMA_20"] = df["Close"].rolling(window=20).mean()
-    df["SMA_50"] = df["Close"].rolling(window=50).mean()
-    ma_signal = "BUY" if df["SMA_20"].iloc[-1] > df["SMA_50"].iloc[-1] else "SELL"
-
-    # --- RSI ---
-    delta = df["Close"].diff()
-    gain = delta.clip(lower=0).rolling(14).mean()
-    loss = -delta.clip(upper=0).rolling(14).mean()
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    latest_rsi = rsi.iloc[-1]
-    rsi_signal = "BUY" if latest_rsi < 30 else "SELL" if latest_rsi > 70 else "HOLD"
-
-    # --- MACD ---
-    ema12 = df["Close"].ewm(span=12, adjust=False).mean()
-    ema26 = df["Close"].ewm(span=26, adjust=False).mean()
-    macd = ema12 - ema26
-    signal = macd.ewm(span=9, adjust=False).mean()
-    macd_signal = "BUY" if macd.iloc[-1] > signal.iloc[-1] else "SELL"
-
-    # --- Combine ---
-    signals = [ma_signal, rsi_signal, macd_signal]
-    buy_count = signals.count("BUY")
-    sell_count = signals.count("SELL")
-
-    if buy_count >= 2:
-        final_signal = "STRONG BUY"
-    elif sell_count >= 2:
-        final_signal = "STRONG SELL"
-    else:
-        final_signal = "HOLD"
-
-    return f"Technical consensus: {final_signal} (MA: {ma_signal}, RSI: {rsi_signal}, MACD: {macd_signal})"
+def make_news_body_tool(stock: str):
+    @tool
+    def getNewsBodyTool(*args, **kwargs) -> list:
+        """
+        Get the news body for a company by reading all text files under
+        assets/rag_assets/{stock}/news/.
+        """
+        print(f"[getNewsBodyTool] Using stock ticker: {stock}")
+
+        base_dir = os.path.join("assets", "rag_assets", str(stock), "news")
+        final_news_content = []
+
+        if not os.path.isdir(base_dir):
+            print(f"[getNewsBodyTool] Directory not found: {base_dir}")
+        else:
+            patterns = ["*.txt", "*.md", "*.text"]
+            files = []
+            for pattern in patterns:
+                files.extend(sorted(glob.glob(os.path.join(base_dir, pattern))))
+
+            for fp in files:
+                try:
+                    if not os.path.isfile(fp):
+                        continue
+                    with open(fp, "r", encoding="utf-8", errors="replace") as f:
+                        content = f.read().strip()
+                        if content:
+                            final_news_content.append(content)
+                except Exception as e:
+                    print(f"[getNewsBodyTool] Failed to read {fp}: {e}")
+
+        if not final_news_content:
+            print(f"[getNewsBodyTool] ⚠️ No news found for {stock}.")
+        else:
+            print(f"[getNewsBodyTool] ✅ Found {len(final_news_content)} news articles for {stock}.")
+
+        return final_news_content
+
+    return getNewsBodyTool
+
+
+def make_find_news_tool(stock: str):
+    @tool
+    def findnewsTool(*args, **kwargs) -> str:
+        """
+        Fetch news articles for a company and save them under
+        assets/rag_assets/{stock}/news/.
+        """
+        print(f"[findnewsTool] Using stock ticker: {stock}")
+
+        try:
+            fetch_for_ticker(stock, limit=12)
+            return f"News articles fetched and saved for {stock}."
+        except Exception as e:
+            traceback_str = traceback.format_exc()
+            print(f"[findnewsTool] Error fetching news for {stock}: {e}\n{traceback_str}")
+            return f"Failed to fetch news for {stock}: {e}"
+
+    return findnewsTool
+
+
+def make_annualised_volatility_tool(stock: str):
+    @tool
+    def getAnnualisedVolatilityTool(*args, **kwargs) -> str:
+        """
+        Get the annualised volatility for a company
+        """
+        print(f"[getAnnualisedVolatilityTool] Using stock ticker: {stock}")
+        dat = yf.Ticker(f"{stock}")
+        df = dat.history(period="3mo")
+        log_returns = np.log(df["Close"] / df["Close"].shift(1))
+        volatility = log_returns.std() * (252**0.5)
+        return volatility
+
+    return getAnnualisedVolatilityTool
+
+
+def make_annualised_return_tool(stock: str):
+    @tool
+    def getAnnualisedReturnTool(*args, **kwargs) -> float:
+        """
+        Get the annualised return for a company
+        """
+        print(f"[getAnnualisedReturnTool] Using stock ticker: {stock}")
+        dat = yf.Ticker(f"{stock}")
+        df = dat.history(period="3mo")
+        cummulative_return = (
+            float(df["Close"].iloc[-1])
+            / float(df["Close"].iloc[0])
+        ) - 1
+        annualised_return = (1 + cummulative_return) ** (252 / len(df)) - 1
+        return annualised_return
+
+    return getAnnualisedReturnTool
+
+
+def make_fundamental_analysis_tool(stock: str):
+    @tool
+    def fundamental_analysis_tool(*args, **kwargs):
+        """Tool to analyze the BalanceSheet of a company and provide a summary"""
+        print(f"[fundamental_analysis_tool] Using stock ticker: {stock}")
+        # Get the stock balance sheet
+        dat = yf.Ticker(f"{stock}")
+        balance_sheet_data = dat.balance_sheet
+
+        # Create messages
+        messages = [
+            SystemMessage(
+                content="You are a financial analyst. Provide correct answers only. If you don't know, say so."
+            ),
+            HumanMessage(
+                content=f"Here is a Pandas DataFrame:\n{balance_sheet_data}\n\nSummarize the financial results in INR. Don't ask for anything else."
+            ),
+        ]
+
+        # Get response
+        response = client(messages)
+
+        # Access content
+        summary = response.content
+        return summary
+
+    return fundamental_analysis_tool
+
+
+def make_moving_averages_tool(stock: str):
+    @tool
+    def getMovingAveragesTool(*args, **kwargs) -> dict:
+        """
+        Compute short-term and long-term moving averages for the company's stock.
+        Returns both SMA and EMA for 20 and 50 days.
+        """
+        print(f"[getMovingAveragesTool] Using stock ticker: {stock}")
+        df = yf.Ticker(stock).history(period="6mo")
+        if df.empty:
+            return {"error": "No data available"}
+
+        df["SMA_20"] = df["Close"].rolling(window=20).mean()
+        df["SMA_50"] = df["Close"].rolling(window=50).mean()
+        df["EMA_20"] = df["Close"].ewm(span=20, adjust=False).mean()
+        df["EMA_50"] = df["Close"].ewm(span=50, adjust=False).mean()
+
+        latest = df.iloc[-1]
+        return {
+            "SMA_20": round(latest["SMA_20"], 2),
+            "SMA_50": round(latest["SMA_50"], 2),
+            "EMA_20": round(latest["EMA_20"], 2),
+            "EMA_50": round(latest["EMA_50"], 2),
+        }
+
+    return getMovingAveragesTool
+
+
+def make_rsi_tool(stock: str):
+    @tool
+    def getRSITool(*args, **kwargs) -> float:
+        """
+        Calculate the 14-day Relative Strength Index (RSI).
+        Returns RSI as a float.
+        """
+        print(f"[getRSITool] Using stock ticker: {stock}")
+        df = yf.Ticker(stock).history(period="6mo")
+        if df.empty:
+            return 0.0
+
+        delta = df["Close"].diff()
+        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+
+        rs = gain / loss
+        rsi = 100 - (100 / (1 + rs))
+        latest_rsi = round(rsi.iloc[-1], 2)
+        return latest_rsi
+
+    return getRSITool
+
+
+def make_macd_tool(stock: str):
+    @tool
+    def getMACDTool(*args, **kwargs) -> dict:
+        """
+        Compute MACD (12, 26, 9) and return the latest MACD line, signal line, and histogram.
+        """
+        print(f"[getMACDTool] Using stock ticker: {stock}")
+        df = yf.Ticker(stock).history(period="6mo")
+        if df.empty:
+            return {"error": "No data available"}
+
+        ema12 = df["Close"].ewm(span=12, adjust=False).mean()
+        ema26 = df["Close"].ewm(span=26, adjust=False).mean()
+        macd_line = ema12 - ema26
+        signal_line = macd_line.ewm(span=9, adjust=False).mean()
+        hist = macd_line - signal_line
+
+        return {
+            "MACD": round(macd_line.iloc[-1], 3),
+            "Signal": round(signal_line.iloc[-1], 3),
+            "Histogram": round(hist.iloc[-1], 3),
+        }
+
+    return getMACDTool
+
+
+def make_technical_signal_tool(stock: str):
+    @tool
+    def getTechnicalSignalTool(*args, **kwargs) -> str:
+        """
+        Generate an overall technical trading signal (BUY / SELL / HOLD)
+        based on moving averages, RSI, and MACD.
+        """
+        print(f"[getTechnicalSignalTool] Using stock ticker: {stock}")
+        df = yf.Ticker(stock).history(period="6mo")
+        if df.empty:
+            return "Insufficient data for signal generation."
+
+        # --- Moving Average Crossover ---
+        df["SMA_20"] = df["Close"].rolling(window=20).mean()
+        df["SMA_50"] = df["Close"].rolling(window=50).mean()
+        ma_signal = "BUY" if df["SMA_20"].iloc[-1] > df["SMA_50"].iloc[-1] else "SELL"
+
+        # --- RSI ---
+        delta = df["Close"].diff()
+        gain = delta.clip(lower=0).rolling(14).mean()
+        loss = -delta.clip(upper=0).rolling(14).mean()
+        rs = gain / loss
+        rsi = 100 - (100 / (1 + rs))
+        latest_rsi = rsi.iloc[-1]
+        rsi_signal = "BUY" if latest_rsi < 30 else "SELL" if latest_rsi > 70 else "HOLD"
+
+        # --- MACD ---
+        ema12 = df["Close"].ewm(span=12, adjust=False).mean()
+        ema26 = df["Close"].ewm(span=26, adjust=False).mean()
+        macd = ema12 - ema26
+        signal = macd.ewm(span=9, adjust=False).mean()
+        macd_signal = "BUY" if macd.iloc[-1] > signal.iloc[-1] else "SELL"
+
+        # --- Combine ---
+        signals = [ma_signal, rsi_signal, macd_signal]
+        buy_count = signals.count("BUY")
+        sell_count = signals.count("SELL")
+
+        if buy_count >= 2:
+            final_signal = "STRONG BUY"
+        elif sell_count >= 2:
+            final_signal = "STRONG SELL"
+        else:
+            final_signal = "HOLD"
+
+        return f"Technical consensus: {final_signal} (MA: {ma_signal}, RSI: {rsi_signal}, MACD: {macd_signal})"
+
+    return getTechnicalSignalTool
 
 # ------------------------
 # CrewBase Class
@@ -373,15 +399,18 @@ class InvestmentCrew:
     tasks_config = "config/tasks.yaml"
 
     llm = llm
-    stock = None  # This will be set dynamically
+
+    def __init__(self, stock: Optional[str] = None):
+        # The ticker is per-instance so concurrent crews can't clobber
+        # each other; tools are bound to it when the agents are built
+        self.stock = stock
 
     # -------- Agents --------
     @agent
     def fundamental_analyst(self) -> Agent:
-        # Pass the tools as function references, not instances
         return Agent(
             config=self.agents_config["fundamental_analyst"],
-            tools=[CustomRagTool, fundamental_analysis_tool],
+            tools=[CustomRagTool, make_fundamental_analysis_tool(self.stock)],
             llm=self.llm,
         )
 
@@ -389,7 +418,10 @@ class InvestmentCrew:
     def valuation_analyst(self) -> Agent:
         return Agent(
             config=self.agents_config["valuation_analyst"],
-            tools=[getAnnualisedVolatilityTool, getAnnualisedReturnTool],
+            tools=[
+                make_annualised_volatility_tool(self.stock),
+                make_annualised_return_tool(self.stock),
+            ],
             llm=self.llm,
             max_retry_limit= 3,
         )
@@ -398,19 +430,19 @@ class InvestmentCrew:
     def sentiment_analyst(self) -> Agent:
         return Agent(
             config=self.agents_config["sentiment_analyst"],
-            tools=[findnewsTool,getNewsBodyTool],
+            tools=[make_find_news_tool(self.stock), make_news_body_tool(self.stock)],
             llm=self.llm,
         )
-    
+
     @agent
     def technical_analyst(self) -> Agent:
         return Agent(
             config=self.agents_config["technical_analyst"],
             tools=[
-                getMovingAveragesTool,
-                getRSITool,
-                getMACDTool,
-                getTechnicalSignalTool,
+                make_moving_averages_tool(self.stock),
+                make_rsi_tool(self.stock),
+                make_macd_tool(self.stock),
+                make_technical_signal_tool(self.stock),
             ],
             llm=self.llm,
         )
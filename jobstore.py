@@ -0,0 +1,283 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except Exception:
+    REDIS_AVAILABLE = False
+
+
+JOB_TTL_SECONDS = 3600       # finished jobs are kept for an hour
+RECENT_INDEX_MAX = 100       # how many job ids the recent index keeps
+MAX_JOBS = 1024              # in-process store cap before LRU eviction
+GC_INTERVAL_SECONDS = 60     # in-process garbage collection cadence
+
+_TERMINAL_STATES = ("completed", "failed")
+
+# Fields returned by the recent-analyses listing
+_RECENT_FIELDS = ("stock_ticker", "status", "created_at", "message")
+
+
+class _InProcessWatch:
+    """Watches a single in-process job via its asyncio.Event"""
+
+    def __init__(self, job: Optional[Dict[str, Any]]):
+        self._job = job
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def wait(self, version: Optional[int], timeout: float) -> bool:
+        """Wait until the job changes past `version`. Returns False on timeout."""
+        if self._job is None:
+            return False
+        if version is not None and self._job["version"] != version:
+            return True
+        try:
+            await asyncio.wait_for(self._job["event"].wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class InProcessJobStore:
+    """Job state held in a process-local dict (single worker only).
+
+    The dict is bounded: inserts past MAX_JOBS evict the oldest finished
+    job, and a periodic gc pass drops finished jobs older than
+    JOB_TTL_SECONDS along with result bodies that clients have already
+    fetched.
+    """
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Newest-last index of job ids, mirroring the Redis job_index
+        self._recent: "deque[str]" = deque(maxlen=RECENT_INDEX_MAX)
+
+    async def create(self, job_id: str, fields: Dict[str, Any]):
+        job = dict(fields)
+        job["version"] = 0
+        job["event"] = asyncio.Event()
+        # The row served by recent() is built once here and mutated in
+        # place as the job progresses, so listing allocates nothing
+        job["recent_view"] = {
+            "job_id": job_id,
+            "stock_ticker": job.get("stock_ticker"),
+            "status": job.get("status"),
+            "created_at": job.get("created_at"),
+            "message": job.get("message"),
+        }
+        self._jobs[job_id] = job
+        self._recent.append(job_id)
+        if len(self._jobs) > MAX_JOBS:
+            self._evict_one()
+
+    def _evict_one(self):
+        # Prefer dropping the oldest finished job; fall back to the oldest
+        victim = None
+        for job_id, job in self._jobs.items():
+            if job["status"] in _TERMINAL_STATES:
+                victim = job_id
+                break
+        if victim is None:
+            victim = next(iter(self._jobs))
+        del self._jobs[victim]
+
+    async def update(self, job_id: str, **fields):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        view = job["recent_view"]
+        for field in ("status", "message"):
+            if field in fields:
+                view[field] = fields[field]
+        if fields.get("status") in _TERMINAL_STATES:
+            job["completed_at"] = time.time()
+        job["version"] += 1
+        # Wake every waiter, then re-arm the event for the next update
+        job["event"].set()
+        job["event"].clear()
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if (job is not None and job["status"] in _TERMINAL_STATES
+                and job.get("result") is not None):
+            # The big result body becomes fair game for gc once a client
+            # has fetched the finished job at least once
+            job["reaped"] = True
+        return job
+
+    def gc(self):
+        """Drop expired finished jobs and already-fetched result bodies"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in _TERMINAL_STATES
+            and now - job.get("completed_at", now) > JOB_TTL_SECONDS
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+        for job in self._jobs.values():
+            if job.get("reaped") and job.get("result") is not None:
+                job["result"] = None
+
+    async def gc_loop(self):
+        while True:
+            await asyncio.sleep(GC_INTERVAL_SECONDS)
+            self.gc()
+
+    async def recent(self, limit: int = 10) -> List[Dict[str, Any]]:
+        # Jobs are appended to the index in creation order, so walking it
+        # newest-first avoids sorting the whole job history per request;
+        # each row is the job's precomputed projection, not a fresh dict
+        recent = []
+        for job_id in reversed(self._recent):
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue  # evicted by the cap or the gc sweep
+            recent.append(job["recent_view"])
+            if len(recent) >= limit:
+                break
+        return recent
+
+    def watch(self, job_id: str) -> _InProcessWatch:
+        return _InProcessWatch(self._jobs.get(job_id))
+
+
+class _RedisWatch:
+    """Watches a job through its Redis pub/sub event channel"""
+
+    def __init__(self, redis, job_id: str):
+        self._redis = redis
+        self._channel = f"job:{job_id}:events"
+        self._pubsub = None
+
+    async def __aenter__(self):
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(self._channel)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._pubsub.unsubscribe(self._channel)
+        await self._pubsub.aclose()
+        return False
+
+    async def wait(self, version: Optional[int], timeout: float) -> bool:
+        """Wait for the next published update. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            message = await self._pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=remaining
+            )
+            if message is not None:
+                return True
+
+
+class RedisJobStore:
+    """Job state in Redis hashes, shared across uvicorn workers/pods.
+
+    Jobs live at job:{id} with an hour TTL, updates are broadcast on
+    job:{id}:events, and a capped sorted set (job_index) keeps the
+    recent-analyses ordering.
+    """
+
+    def __init__(self, url: str):
+        self._redis = aioredis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> Dict[str, str]:
+        return {k: json.dumps(v) for k, v in fields.items()}
+
+    @staticmethod
+    def _decode(raw: Dict[str, str]) -> Dict[str, Any]:
+        job = {}
+        for k, v in raw.items():
+            if k == "version":
+                job[k] = int(v)
+            else:
+                job[k] = json.loads(v)
+        return job
+
+    async def create(self, job_id: str, fields: Dict[str, Any]):
+        key = f"job:{job_id}"
+        pipe = self._redis.pipeline()
+        pipe.hset(key, mapping={**self._encode(fields), "version": 0})
+        pipe.expire(key, JOB_TTL_SECONDS)
+        pipe.zadd("job_index", {job_id: time.time()})
+        pipe.zremrangebyrank("job_index", 0, -(RECENT_INDEX_MAX + 1))
+        await pipe.execute()
+
+    async def update(self, job_id: str, **fields):
+        key = f"job:{job_id}"
+        # Mirror the in-process store: a job whose hash already expired
+        # stays gone instead of being resurrected as a partial hash
+        if not await self._redis.exists(key):
+            return
+        pipe = self._redis.pipeline()
+        pipe.hset(key, mapping=self._encode(fields))
+        pipe.hincrby(key, "version", 1)
+        # Refresh the TTL so long-running jobs stay alive while they
+        # still receive updates
+        pipe.expire(key, JOB_TTL_SECONDS)
+        results = await pipe.execute()
+        await self._redis.publish(f"job:{job_id}:events", results[1])
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.hgetall(f"job:{job_id}")
+        if not raw:
+            return None
+        return self._decode(raw)
+
+    async def recent(self, limit: int = 10) -> List[Dict[str, Any]]:
+        job_ids = await self._redis.zrevrange("job_index", 0, limit - 1)
+        pipe = self._redis.pipeline()
+        for job_id in job_ids:
+            pipe.hmget(f"job:{job_id}", *_RECENT_FIELDS)
+        rows = await pipe.execute()
+
+        recent = []
+        for job_id, row in zip(job_ids, rows):
+            if not any(row):
+                continue  # job hash already expired
+            entry = {"job_id": job_id}
+            for field, value in zip(_RECENT_FIELDS, row):
+                entry[field] = json.loads(value) if value is not None else None
+            recent.append(entry)
+        return recent
+
+    def watch(self, job_id: str) -> _RedisWatch:
+        return _RedisWatch(self._redis, job_id)
+
+    async def gc_loop(self):
+        """Nothing to do: Redis expires job hashes via their TTL"""
+        return
+
+
+def get_job_store():
+    """Pick the job store backend from the environment.
+
+    Set REDIS_URL (e.g. redis://localhost:6379/0) to share job state
+    across workers; otherwise jobs stay in-process.
+    """
+    redis_url = os.environ.get("REDIS_URL")
+    if redis_url:
+        if not REDIS_AVAILABLE:
+            print("REDIS_URL is set but the redis package is not installed; "
+                  "falling back to in-process job store")
+        else:
+            print(f"Using Redis job store at {redis_url}")
+            return RedisJobStore(redis_url)
+    return InProcessJobStore()
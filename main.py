@@ -15,7 +15,7 @@ def run(stock: str):
     inputs = {
         'topic': f'give me report for {stock}',
     }
-    return InvestmentCrew().crew().kickoff(inputs=inputs).raw
+    return InvestmentCrew(stock).crew().kickoff(inputs=inputs).raw
 
 
 def main():
@@ -34,9 +34,6 @@ def main():
 
     args = parser.parse_args()
 
-    # Set stock
-    InvestmentCrew.stock = args.stock
-
     # Handle PDF if provided
     if args.pdf:
         if not args.pdf.lower().endswith(".pdf"):